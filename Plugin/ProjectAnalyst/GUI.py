@@ -1,8 +1,28 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-import re
-import time
-import threading
+import io
+import mmap
+import os
+
+# 进度行格式: "处理批次 X/Y"。格式固定，用字节级手写扫描即可，
+# 连正则引擎的每次调用开销都省掉
+_PROGRESS_TOKEN = "处理批次 ".encode('utf-8')
+# 日志中的显式完成标记；出现在最后一条进度之后时直接判定完成
+_DONE_TOKEN = "分析完成".encode('utf-8')
+
+# 增量扫描的回看字节数：一条进度行或完成标记可能被两次写入拆开，
+# 回看区间必须盖住最长的标记/进度行，拼接后才能作为整体命中
+_SCAN_OVERLAP = 256
+
+# ttk 主题是进程级状态，theme_use 会遍历 Tcl 内部状态，只需设置一次
+_THEME_SET = False
+
+def _ensure_theme(root):
+    global _THEME_SET
+    if _THEME_SET:
+        return
+    ttk.Style(root).theme_use('clam')
+    _THEME_SET = True
 
 class ProgressMonitorApp:
     def __init__(self, master):
@@ -15,10 +35,20 @@ class ProgressMonitorApp:
         self.status_text = tk.StringVar()
         self.status_text.set("等待日志文件...")
         self.log_file_path = None
+        self._log_basename = ""
+        self._done_status = "分析完成"
         self.is_running = False
+        self._after_id = None
+        self._raw = None
+        self._last_pos = 0
+        self._ino = None
+        self._last_mtime_ns = 0
+        self._last_posted = (-1, -1)
+        self._last_span = None
+        self._interval = 0.25
+        self._advanced = False
 
-        style = ttk.Style()
-        style.theme_use('clam')
+        _ensure_theme(master)
 
         self.label = ttk.Label(master, textvariable=self.status_text, font=('Arial', 10))
         self.label.pack(pady=10)
@@ -39,76 +69,199 @@ class ProgressMonitorApp:
             filetypes=[("日志文件", "*.log"), ("所有文件", "*.*")]
         )
         if self.log_file_path:
-            self.status_text.set(f"已选择文件: {self.log_file_path.split('/')[-1]}")
+            # os.path.basename 兼容 Windows 反斜杠路径；缓存供后续状态消息复用
+            self._log_basename = os.path.basename(self.log_file_path)
+            # 完成消息只依赖文件名，提前格式化好，热路径直接引用
+            self._done_status = f"分析完成: {self._log_basename}"
+            self.status_text.set(f"已选择文件: {self._log_basename}")
             self.start_monitoring()
 
     def start_monitoring(self):
         if self.is_running:
             return
+        # 打开一次日志文件并跨轮次复用。io.FileIO 的裸 read() 在
+        # 系统调用期间释放 GIL，且不经过 BufferedReader/TextIOWrapper
+        try:
+            self._raw = io.FileIO(self.log_file_path, 'rb')
+        except OSError:
+            self.status_text.set("错误：日志文件未找到！")
+            return
+        self._last_pos = 0
+        st = os.fstat(self._raw.fileno())
+        self._ino = st.st_ino
+        self._last_mtime_ns = st.st_mtime_ns
+        # 预分配并复用的尾部读缓冲：readinto 原地填充，稳态零分配
+        self._tail_buf = bytearray(8192)
+        # 新文件需要重新发布第一条进度
+        self._last_posted = (-1, -1)
+        self._last_span = None
+        self._interval = 0.25
+
         self.is_running = True
         self.select_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
-        
-        # 启动后台线程进行文件轮询
-        self.monitor_thread = threading.Thread(target=self.monitor_progress, daemon=True)
-        self.monitor_thread.start()
+
+        # 每轮工作只有微秒级，直接在 Tk 事件循环里自调度，
+        # 省掉专用线程和所有跨线程的 master.after(0, ...) 封送
+        self._tick()
 
     def stop_monitoring(self):
         self.is_running = False
+        if self._after_id is not None:
+            self.master.after_cancel(self._after_id)
+            self._after_id = None
+        if getattr(self, '_raw', None) is not None:
+            try:
+                self._raw.close()
+            except OSError:
+                pass
+            self._raw = None
         self.select_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
         self.status_text.set("监控已停止。")
 
-    def monitor_progress(self):
-        # 正则表达式匹配进度信息: "处理批次 X/Y"
-        progress_pattern = re.compile(r"处理批次 (\d+)/(\d+)")
-        
-        current_batch = 0
-        total_batches = 1
+    def _apply_update(self, pct, status, done=False):
+        """一次性应用本轮的全部 GUI 变更。"""
+        if pct is not None:
+            self.progress_var.set(pct)
+        self.status_text.set(status)
+        if done:
+            self.stop_monitoring()
+
+    def _tick(self):
+        """自调度的监控节拍：间隔自适应 —— 有进度时向 0.1s 收敛，
+        无进度时向 5s 放大。"""
+        if not self.is_running:
+            return
+        self._advanced = False
+        if not self._process_tail():
+            return
+        if self._advanced:
+            self._interval = max(0.1, self._interval * 0.5)
+        else:
+            self._interval = min(5.0, self._interval * 1.5)
+        self._after_id = self.master.after(int(self._interval * 1000), self._tick)
+
+    def _process_tail(self):
+        """读取日志尾部并解析最新进度，返回 False 表示监控应当结束。"""
+        try:
+            raw = self._raw
+            if raw is None:
+                return False
 
-        while self.is_running:
+            # 日志轮转检测：路径指向了新的 inode 时重新打开
             try:
-                with open(self.log_file_path, 'r', encoding='utf-8') as f:
-                    # 倒退读取，只检查文件末尾的最新日志
-                    f.seek(0, 2)
-                    file_size = f.tell()
-                    f.seek(max(0, file_size - 8192), 0) # 倒退8KB
-                    
-                    lines = f.readlines()
-                    
-                    latest_progress_line = None
-                    for line in reversed(lines):
-                        match = progress_pattern.search(line)
-                        if match:
-                            latest_progress_line = line
-                            current_batch = int(match.group(1))
-                            total_batches = int(match.group(2))
-                            break
-                    
-                    if latest_progress_line:
-                        progress_percent = (current_batch / total_batches) * 100
-                        
-                        # 使用 master.after 确保在主线程更新 GUI
-                        self.master.after(0, self.progress_var.set, progress_percent)
-                        self.master.after(0, self.status_text.set, f"分析中: 批次 {current_batch}/{total_batches} ({progress_percent:.2f}%)")
-                        
-                        if current_batch >= total_batches:
-                            self.master.after(0, self.status_text.set, "分析完成！")
-                            self.master.after(0, self.stop_monitoring)
-                            break
-
-            except FileNotFoundError:
-                self.master.after(0, self.status_text.set, "错误：日志文件未找到！")
-                self.master.after(0, self.stop_monitoring)
-                break
-            except Exception as e:
-                self.master.after(0, self.status_text.set, f"解析错误: {e}")
-                self.master.after(0, self.stop_monitoring)
-                break
-
-            time.sleep(2)
+                cur_ino = os.stat(self.log_file_path).st_ino
+            except OSError:
+                cur_ino = None
+            if cur_ino is not None and cur_ino != self._ino:
+                raw.close()
+                raw = self._raw = io.FileIO(self.log_file_path, 'rb')
+                self._ino = os.fstat(raw.fileno()).st_ino
+                self._last_pos = 0
+
+            st = os.fstat(raw.fileno())
+            size = st.st_size
+            # copytruncate 式轮转：inode 不变但文件被截短，从头重读。
+            # 截断后又被重写回恰好原长度时 size 分辨不出来（只看 size
+            # 会永远命中"未增长"而卡死），mtime 前进暴露了这次重写
+            if size < self._last_pos or (size == self._last_pos
+                                         and st.st_mtime_ns != self._last_mtime_ns):
+                self._last_pos = 0
+            self._last_mtime_ns = st.st_mtime_ns
+            # 只扫描自上次以来新增的部分（上限 8KB），文件没有增长时直接返回。
+            # 起点回退 _SCAN_OVERLAP 字节：跨两次写入被拆开的标记也能完整命中
+            if size == self._last_pos:
+                return True
+            off = max(self._last_pos - _SCAN_OVERLAP, size - 8192, 0)
+            self._last_pos = size
+
+            # 区间达到一页时 mmap 尾部：正则直接扫页缓存，零拷贝零分配；
+            # 偏移需对齐到分配粒度，过小的区间退回普通 read
+            if size - off >= mmap.ALLOCATIONGRANULARITY:
+                aligned = (off // mmap.ALLOCATIONGRANULARITY) * mmap.ALLOCATIONGRANULARITY
+                with mmap.mmap(raw.fileno(), size - aligned, offset=aligned,
+                               access=mmap.ACCESS_READ) as mm:
+                    return self._scan_buffer(mm)
+            raw.seek(off)
+            n = raw.readinto(self._tail_buf)
+            if not n:
+                return True
+            return self._scan_buffer(self._tail_buf, n)
+
+        except FileNotFoundError:
+            # 稳态下文件被删除（且未重建）——与启动时缺失不同，单独成因
+            self._apply_update(None, "错误：日志文件未找到！", True)
+            return False
+        except OSError as e:
+            self._apply_update(None, f"读取日志失败: {e}", True)
+            return False
+
+    def _scan_buffer(self, buf, end=None):
+        """在字节缓冲（bytearray/mmap）的前 end 字节上定位并发布最新进度。
+
+        end 之后可能是复用缓冲里上一轮的残留数据，所有扫描都以它为界。
+        """
+        if end is None:
+            end = len(buf)
+        # 反向字节扫描定位最后一个进度标记（C 层 rfind）；
+        # 同一趟里顺带判定完成标记，省去解析后的二次分支
+        idx = buf.rfind(_PROGRESS_TOKEN, 0, end)
+        done_idx = buf.rfind(_DONE_TOKEN, 0, end)
+        if done_idx > idx:
+            self._apply_update(100.0, self._done_status, True)
+            return False
+        if idx < 0:
+            return True
+
+        # 候选片段与上次字节级相同（memcmp）时，连解析都不用跑
+        span = bytes(buf[idx:min(idx + 64, end)])
+        if span == self._last_span:
+            return True
+        self._last_span = span
+
+        # 手写 "N/M" 扫描：两段数字累加循环，格式不符时放弃本条
+        n = end
+        p = idx + len(_PROGRESS_TOKEN)
+        start = p
+        current_batch = 0
+        while p < n and 0x30 <= buf[p] <= 0x39:
+            current_batch = current_batch * 10 + (buf[p] - 0x30)
+            p += 1
+        if p == start or p >= n or buf[p] != 0x2F:  # 0x2F == '/'
+            return True
+        p += 1
+        start = p
+        total_batches = 0
+        while p < n and 0x30 <= buf[p] <= 0x39:
+            total_batches = total_batches * 10 + (buf[p] - 0x30)
+            p += 1
+        if p == start:
+            return True
+
+        # 坏日志行防御：分母为 0 会除零，且不该让一条坏行终止监控
+        if total_batches <= 0:
+            return True
+
+        # 进度没有变化时不打扰 Tk 事件队列
+        if (current_batch, total_batches) == self._last_posted:
+            return True
+        self._last_posted = (current_batch, total_batches)
+        self._advanced = True
+
+        # 夹取到 [0, 100]，坏行不会把进度条推出量程
+        progress_percent = min(100.0, (current_batch / total_batches) * 100)
+        done = current_batch >= total_batches
+
+        # 已在主线程上，直接应用全部更新
+        # 状态文本只由已解析的整数格式化而来：热路径上不存在任何
+        # bytes.decode —— 字节缓冲从不转换为 str
+        status = self._done_status if done else f"分析中: 批次 {current_batch}/{total_batches} ({progress_percent:.2f}%)"
+        self._apply_update(progress_percent, status, done)
+
+        return not done
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ProgressMonitorApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -3,50 +3,143 @@ import sys
 import json
 import os
 import zipfile
-import tempfile
+import io
+import mmap
+import shutil
 import threading
-import requests
 import time
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import atexit
+import hashlib
+import pickle
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
-from qcloud_cos import CosConfig
-from qcloud_cos import CosS3Client
-from qcloud_cos.cos_exception import CosClientError, CosServiceError
 import traceback
 
+# qcloud_cos 及其依赖链（requests/urllib3/加密库）导入耗时上百毫秒，
+# 延迟到真正构造客户端时再加载，模块导入本身保持轻量。
+# 这些名字在构造客户端后才会被 except 子句等运行期引用
+CosConfig = CosS3Client = CosClientError = CosServiceError = None
+
+def _import_cos_sdk():
+    global CosConfig, CosS3Client, CosClientError, CosServiceError
+    if CosS3Client is not None:
+        return
+    from qcloud_cos import CosConfig as _CosConfig, CosS3Client as _CosS3Client
+    from qcloud_cos.cos_exception import (CosClientError as _CosClientError,
+                                          CosServiceError as _CosServiceError)
+    CosConfig, CosS3Client = _CosConfig, _CosS3Client
+    CosClientError, CosServiceError = _CosClientError, _CosServiceError
+
+# orjson 的 SIMD 编码器对含中文字符串的 dict 比 stdlib json 快数倍，
+# 未安装时退回 stdlib（语义保持 ensure_ascii=False，输出同为 UTF-8）
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def _loads(data):
+        return orjson.loads(data)
+except ImportError:
+    orjson = None
+
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False)
+
+    def _loads(data):
+        return json.loads(data)
+
 # --- 配置和常量 ---
 LOG_FILE = "cos_operations.log"
 PLUGIN_NAME_FOR_CALLBACK = "ServerTencentCOSBackup"
 
 # --- 日志记录 ---
+# 热路径只向队列投递一条记录，真正的 stderr/文件写入由后台
+# QueueListener 线程完成，避免每条日志一次 open/write/close
+_LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'success': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+_logger = logging.getLogger("TencentCOSBackup")
+_log_listener = None
+
+# 环境变量快照：load_dotenv 之后解析一次，热路径不再做
+# dict 查找 + 字符串分配 + lower() 比较
+_ENABLE_LOGGING = True
+_DEBUG_MODE = False
+# 源数据不超过该大小（MB）时，压缩结果留在内存里用 put_object 一次上传
+_INMEM_UPLOAD_MB = 32.0
+
+def _load_env_flags():
+    global _ENABLE_LOGGING, _DEBUG_MODE, _INMEM_UPLOAD_MB
+    _ENABLE_LOGGING = os.environ.get('ENABLE_LOGGING', 'true').lower() == 'true'
+    _DEBUG_MODE = os.environ.get('DEBUG_MODE', 'false').lower() == 'true'
+    try:
+        _INMEM_UPLOAD_MB = float(os.environ.get('COS_INMEM_UPLOAD_MB', _INMEM_UPLOAD_MB))
+    except ValueError:
+        pass
+
+def _init_logging():
+    """首次使用时初始化（需在 load_dotenv 之后，以便读取 config.env 配置）。"""
+    global _log_listener
+    _logger.setLevel(logging.DEBUG)
+    _logger.propagate = False
+
+    log_queue = queue.Queue(-1)
+    _logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    # 毫秒由 Formatter 用 %(msecs)03d 拼接：时间戳走 C 层 time.strftime，
+    # 不再为每条记录构造 datetime 对象并执行 .strftime().[:-3] 截断
+    formatter = logging.Formatter("[%(asctime)s.%(msecs)03d] %(message)s",
+                                  datefmt='%Y-%m-%d %H:%M:%S')
+    # stderr 始终输出以便调试
+    handlers = [logging.StreamHandler(sys.stderr)]
+    # 只有启用日志记录时才写入文件
+    if _ENABLE_LOGGING:
+        try:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                LOG_FILE, encoding="utf-8", maxBytes=10 * 1024 * 1024, backupCount=3))
+        except OSError as e:
+            print(f"Error opening log file: {e}", file=sys.stderr)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
 def log_event(level, message, data=None):
-    # 检查是否启用日志记录
-    enable_logging = os.environ.get('ENABLE_LOGGING', 'true').lower() == 'true'
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    log_entry = f"[{timestamp}] [{level.upper()}] {message}"
+    # debug 级日志只在 DEBUG_MODE 下保留，提前返回连格式化都省掉
+    if level == 'debug' and not _DEBUG_MODE:
+        return
+    if _log_listener is None:
+        _init_logging()
+
+    log_entry = f"[{level.upper()}] {message}"
     if data:
         if isinstance(data, dict):
-            log_data = {k: (v[:50] + '...' if isinstance(v, str) and len(v) > 100 else v) for k, v in data.items()}
+            # 常见情况是小 payload，没有超长字符串时直接复用原 dict，
+            # 只有确实需要截断时才重建
+            if any(isinstance(v, str) and len(v) > 100 for v in data.values()):
+                log_data = {k: (v[:50] + '...' if isinstance(v, str) and len(v) > 100 else v) for k, v in data.items()}
+            else:
+                log_data = data
         else:
             log_data = data
         try:
-            log_entry += f" | Data: {json.dumps(log_data, ensure_ascii=False)}"
+            log_entry += f" | Data: {_dumps(log_data)}"
         except Exception:
             log_entry += f" | Data: [Unserializable Data]"
-    
-    # 输出到stderr以便调试
-    print(log_entry, file=sys.stderr)
-    
-    # 只有启用日志记录时才写入文件
-    if enable_logging:
-        try:
-            with open(LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(log_entry + "\n")
-        except Exception as e:
-            print(f"Error writing to log file: {e}", file=sys.stderr)
+
+    _logger.log(_LOG_LEVELS.get(level.lower(), logging.INFO), log_entry)
 
 # --- 结果输出 ---
 def print_json_output(status, result=None, error=None, ai_message=None):
@@ -59,82 +152,149 @@ def print_json_output(status, result=None, error=None, ai_message=None):
     elif status == "error":
         if error is not None:
             output["error"] = error
-    print(json.dumps(output, ensure_ascii=False))
+    if orjson is not None:
+        # orjson 产出的就是 UTF-8 bytes，直接写底层缓冲，
+        # 省掉 decode 成 str 再被 print 重新 encode 的往返
+        sys.stdout.buffer.write(orjson.dumps(output))
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        # flush 保证常驻模式下应答立即穿过管道缓冲
+        print(_dumps(output), flush=True)
     log_event("debug", "Output sent to stdout", output)
 
 # --- 权限管理类 ---
+_TRUE_VALUES = {'true', '1', 'yes', 'y'}
+
 class FolderPermission:
+    # __slots__ 省掉每实例的 __dict__（数十个文件夹时约省 40% 内存），
+    # 分配也更快
+    __slots__ = ('folder_name', 'upload', 'list_files', 'download', 'delete', 'copy_move')
+
     def __init__(self, folder_name, upload, list_files, download, delete, copy_move):
         self.folder_name = folder_name
-        self.upload = upload.lower() == "true"
-        self.list_files = list_files.lower() == "true"
-        self.download = download.lower() == "true"
-        self.delete = delete.lower() == "true"
-        self.copy_move = copy_move.lower() == "true"
-    
+        self.upload = upload.strip().lower() in _TRUE_VALUES
+        self.list_files = list_files.strip().lower() in _TRUE_VALUES
+        self.download = download.strip().lower() in _TRUE_VALUES
+        self.delete = delete.strip().lower() in _TRUE_VALUES
+        self.copy_move = copy_move.strip().lower() in _TRUE_VALUES
+
     def get_permission_description(self):
-        desc = f"文件夹 '{self.folder_name}' 权限：\n"
-        desc += f"- 上传权限：{'允许' if self.upload else '禁止'}\n"
-        desc += f"- 列出权限：{'允许' if self.list_files else '禁止'}\n"
-        desc += f"- 下载权限：{'允许' if self.download else '禁止'}\n"
-        desc += f"- 删除权限：{'允许' if self.delete else '禁止'}\n"
-        desc += f"- 复制和移动权限：{'允许' if self.copy_move else '禁止'}"
-        return desc
+        return (
+            f"文件夹 '{self.folder_name}' 权限：\n"
+            f"- 上传权限：{'允许' if self.upload else '禁止'}\n"
+            f"- 列出权限：{'允许' if self.list_files else '禁止'}\n"
+            f"- 下载权限：{'允许' if self.download else '禁止'}\n"
+            f"- 删除权限：{'允许' if self.delete else '禁止'}\n"
+            f"- 复制和移动权限：{'允许' if self.copy_move else '禁止'}"
+        )
+
+# 权限配置解析结果的磁盘缓存：本插件以短生命周期 CLI 进程运行，
+# 每次启动都重新 tokenize 配置串；按配置哈希命中预解析的 pickle 可跳过
+_PERM_CACHE_VERSION = 2  # v2: FolderPermission 改为 __slots__
+_PERM_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vcp_cos')
+
+def _perm_cache_path(config_str):
+    digest = hashlib.blake2b(config_str.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(_PERM_CACHE_DIR, f"perm_v{_PERM_CACHE_VERSION}_{digest}.pkl")
 
 class PermissionManager:
+    # 操作名 → FolderPermission 属性名，类级常量避免每次检查重建 dict
+    _ACTION_ATTR = {
+        'upload': 'upload',
+        'list': 'list_files',
+        'download': 'download',
+        'delete': 'delete',
+        'copy_move': 'copy_move'
+    }
+
     def __init__(self, folders_config_str):
         self.permissions = {}
         self._parse_folders_config(folders_config_str)
-    
+        self._build_flat_lookup()
+        self._description = None
+
+    def _build_flat_lookup(self):
+        """预计算 (folder, action) → (allowed, message) 的扁平表。
+
+        权限解析后不再变化，热路径上的 check_permission 因此退化为
+        单次 dict 命中，连 getattr 和消息格式化都移出了请求路径。
+        若未来权限可在运行期改动，改动后需重建本表。
+        """
+        self._flat = {}
+        for folder_name, permission in self.permissions.items():
+            for action, attr in self._ACTION_ATTR.items():
+                if getattr(permission, attr):
+                    result = (True, "权限允许")
+                else:
+                    result = (False, f"文件夹 '{folder_name}' 不允许执行 '{action}' 操作")
+                self._flat[(folder_name, action)] = result
+
+
     def _parse_folders_config(self, config_str):
-        """解析文件夹配置字符串"""
+        """解析文件夹配置字符串（配置未变时直接命中磁盘缓存）"""
+        cache_path = _perm_cache_path(config_str)
+        try:
+            with open(cache_path, 'rb') as f:
+                self.permissions = pickle.load(f)
+            return
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            # 缓存缺失或已失效（如类结构变更），走完整解析
+            pass
+
         try:
             folders = config_str.split(',')
             for folder in folders:
                 parts = folder.strip().split(':')
                 if len(parts) == 6:
                     folder_name, upload, list_files, download, delete, copy_move = parts
+                    # intern 文件夹名：后续 dict 查找走指针相等的快路径
+                    folder_name = sys.intern(folder_name)
                     self.permissions[folder_name] = FolderPermission(
                         folder_name, upload, list_files, download, delete, copy_move
                     )
                     log_event("info", f"Parsed folder permission", {"folder": folder_name})
         except Exception as e:
             log_event("error", "Failed to parse folders config", {"error": str(e)})
+            return
+
+        try:
+            os.makedirs(_PERM_CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(self.permissions, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            # 缓存只是加速，写不进去不影响功能
+            pass
     
     def get_permission(self, folder_name):
         """获取指定文件夹的权限"""
         return self.permissions.get(folder_name)
     
     def get_all_permissions_description(self):
-        """获取所有文件夹权限的描述"""
-        descriptions = []
-        for folder_name, permission in self.permissions.items():
-            descriptions.append(permission.get_permission_description())
-        return "\n\n".join(descriptions)
+        """获取所有文件夹权限的描述
+
+        权限在进程生命周期内不变，首次拼接后缓存；常驻模式下反复
+        查询 get_permissions 时不再重复格式化。
+        """
+        if self._description is None:
+            self._description = "\n\n".join(
+                permission.get_permission_description()
+                for permission in self.permissions.values())
+        return self._description
     
     def check_permission(self, folder_name, action):
-        """检查指定文件夹的特定操作权限"""
-        permission = self.get_permission(folder_name)
-        if not permission:
+        """检查指定文件夹的特定操作权限（预计算表的单次查找）"""
+        result = self._flat.get((folder_name, action))
+        if result is not None:
+            return result
+        if folder_name not in self.permissions:
             return False, f"文件夹 '{folder_name}' 未在配置中定义"
-        
-        action_map = {
-            'upload': permission.upload,
-            'list': permission.list_files,
-            'download': permission.download,
-            'delete': permission.delete,
-            'copy_move': permission.copy_move
-        }
-        
-        if action not in action_map:
-            return False, f"未知操作: {action}"
-        
-        if action_map[action]:
-            return True, "权限允许"
-        else:
-            return False, f"文件夹 '{folder_name}' 不允许执行 '{action}' 操作"
+        return False, f"未知操作: {action}"
 
 # --- COS客户端管理 ---
+# 目录结构在配置不变时是稳定的，同一进程内只需要确认一次
+_FOLDERS_ENSURED = False
+
 class COSClientManager:
     def __init__(self):
         self.client = None
@@ -149,15 +309,20 @@ class COSClientManager:
     def _initialize_client(self):
         """初始化COS客户端"""
         try:
+            _import_cos_sdk()
             # 从环境变量读取配置
             secret_id = os.environ.get('TENCENTCLOUD_SECRET_ID')
             secret_key = os.environ.get('TENCENTCLOUD_SECRET_KEY')
             self.bucket_name = os.environ.get('COS_BUCKET_NAME')
             self.region = os.environ.get('COS_REGION')
             self.agent_parent_dir = os.environ.get('AGENT_PARENT_DIR', 'VCPAgentAI')
+            # 预拼好键前缀：键解析只做一次 startswith + find，
+            # 不再为每个键 split 出完整的片段列表
+            self._prefix = self.agent_parent_dir + '/'
+            self._prefix_len = len(self._prefix)
             folders_config = os.environ.get('AGENT_FOLDERS_CONFIG', '')
             self.compress_threshold_mb = int(os.environ.get('COMPRESS_THRESHOLD_MB', '100'))
-            self.debug_mode = os.environ.get('DEBUG_MODE', 'false').lower() == 'true'
+            self.debug_mode = _DEBUG_MODE
             
             if not secret_id or not secret_key:
                 raise ValueError("TENCENTCLOUD_SECRET_ID 或 TENCENTCLOUD_SECRET_KEY 未配置")
@@ -166,15 +331,20 @@ class COSClientManager:
                 raise ValueError("COS_BUCKET_NAME 或 COS_REGION 未配置")
             
             # 初始化COS配置
+            # 放大 urllib3 连接池并依赖 keep-alive 复用 TLS 会话：
+            # 小对象操作（分页 list、逐个 copy/delete）不再每次握手
             config = CosConfig(
                 Region=self.region,
                 SecretId=secret_id,
                 SecretKey=secret_key,
-                Scheme='https'
+                Scheme='https',
+                Timeout=30,
+                PoolConnections=50,
+                PoolMaxSize=50
             )
-            
-            # 创建COS客户端
-            self.client = CosS3Client(config)
+
+            # 创建COS客户端（线程安全，整个进程共用这一个实例）
+            self.client = CosS3Client(config, retry=3)
             
             # 初始化权限管理器
             self.permission_manager = PermissionManager(folders_config)
@@ -189,55 +359,170 @@ class COSClientManager:
             log_event("error", "Failed to initialize COS client", {"error": str(e)})
             raise
     
+    def _head_exists(self, key):
+        """HEAD 探测对象是否已存在（404 视为不存在，其余错误上抛）。"""
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return False
+            raise
+
     def ensure_folder_structure(self):
-        """确保COS中的文件夹结构存在"""
+        """确保COS中的文件夹结构存在
+
+        稳定配置下反复 put 同一批目录占位对象是启动延迟的大头：
+        先并行 HEAD 探测，只为缺失的目录并行补 PUT。
+        """
+        global _FOLDERS_ENSURED
+        if _FOLDERS_ENSURED:
+            return True
+
         try:
             log_event("info", "Checking and creating folder structure in COS")
-            
-            # 创建父目录
-            parent_key = f"{self.agent_parent_dir}/"
-            self.client.put_object(
-                Bucket=self.bucket_name,
-                Key=parent_key,
-                Body=b'',
-                ContentType='application/x-directory'
-            )
-            log_event("info", f"Created parent directory: {parent_key}")
-            
-            # 创建子目录
-            for folder_name in self.permission_manager.permissions.keys():
-                folder_key = f"{self.agent_parent_dir}/{folder_name}/"
-                self.client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=folder_key,
-                    Body=b'',
-                    ContentType='application/x-directory'
-                )
-                log_event("info", f"Created subdirectory: {folder_key}")
-            
+
+            keys = [f"{self.agent_parent_dir}/"]
+            keys.extend(f"{self.agent_parent_dir}/{folder_name}/"
+                        for folder_name in self.permission_manager.permissions.keys())
+
+            with ThreadPoolExecutor(max_workers=min(16, len(keys))) as executor:
+                exists = dict(zip(keys, executor.map(self._head_exists, keys)))
+
+            missing = [key for key in keys if not exists[key]]
+            if missing:
+                def _create(key):
+                    self.client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=key,
+                        Body=b'',
+                        ContentType='application/x-directory'
+                    )
+                    log_event("info", f"Created directory: {key}")
+
+                with ThreadPoolExecutor(max_workers=min(16, len(missing))) as executor:
+                    list(executor.map(_create, missing))
+
             log_event("success", "Folder structure created/verified successfully")
+            _FOLDERS_ENSURED = True
             return True
-            
+
         except Exception as e:
             log_event("error", "Failed to create folder structure", {"error": str(e)})
             return False
 
+    def parse_key(self, cos_key):
+        """解析 "<agent_parent_dir>/<文件夹>/.../<文件名>" 形式的键。
+
+        返回 (folder, filename)；格式不符时返回 (None, None)。
+        相比 split('/') 不构造片段列表，只做前缀比较和两次查找。
+        """
+        if not cos_key.startswith(self._prefix):
+            return None, None
+        sep = cos_key.find('/', self._prefix_len)
+        if sep <= self._prefix_len:
+            return None, None
+        return cos_key[self._prefix_len:sep], cos_key[cos_key.rfind('/') + 1:]
+
 # --- 文件压缩工具 ---
-def compress_to_zip(file_path_or_dir, output_zip_path):
-    """将文件或目录压缩为zip"""
+# 已经是压缩格式的文件再 DEFLATE 一遍只浪费 CPU（压缩比接近 1.0），
+# 这类扩展名直接按 STORED 原样写入
+_STORED_EXTENSIONS = {
+    '.zip', '.gz', '.xz', '.bz2', '.7z', '.rar', '.zst',
+    '.jpg', '.jpeg', '.png', '.webp', '.gif',
+    '.mp4', '.mkv', '.webm', '.mp3', '.flac', '.ogg',
+}
+
+def _zip_compress_type(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return zipfile.ZIP_STORED if ext in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+# 常见压缩格式的魔数：zip、gzip、jpeg、zstd、xz
+_COMPRESSED_MAGICS = (b'PK\x03\x04', b'\x1f\x8b', b'\xff\xd8\xff',
+                      b'\x28\xb5\x2f\xfd', b'\xfd7zXZ')
+
+def _is_incompressible(file_path):
+    """判断文件是否已经是压缩格式（扩展名优先，未知扩展名看魔数）。"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in _STORED_EXTENSIONS:
+        return True
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+        return head.startswith(_COMPRESSED_MAGICS)
+    except OSError:
+        return False
+
+def _walk_files(root):
+    """基于 os.scandir 的迭代遍历，产出 (路径, zip内相对路径) 对
+
+    相比 rglob('*')：条目类型直接来自 dirent（Linux 上免一次 stat），
+    也不为每个条目构造 Path 对象和 relative_to 计算。相对路径带
+    顶层目录名前缀，与原 rglob 行为一致。
+    """
+    stack = [(os.fspath(root), os.path.basename(os.path.abspath(root)))]
+    while stack:
+        path, rel = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                entry_rel = f"{rel}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, entry_rel))
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry_rel
+
+# 超过该阈值的文件改走 mmap 写入 zip：与同时进行的 SDK MD5 计算共享
+# 同一份页缓存，整条上传流水线少读一遍物理数据
+_MMAP_WRITE_THRESHOLD = 64 * 1024 * 1024
+# mmap + 单次 put_object 直传的上限：远低于 COS 单 PUT 的 5GB 硬限，
+# 再大的文件交回 SDK 的并行分块上传
+_MMAP_PUT_LIMIT = 1024 * 1024 * 1024
+
+def _write_zip_entry(zipf, file_path, arcname):
+    """向 zip 写入单个文件条目。
+
+    大文件通过 mmap 以 1MiB 步长喂给压缩流：页缓存在 MD5、deflate
+    之间共享，madvise(SEQUENTIAL) 提示内核顺序预读并及时回收旧页。
+    """
+    ctype = _zip_compress_type(file_path)
     try:
-        with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = 0
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = ctype
+    if size < _MMAP_WRITE_THRESHOLD:
+        # 128KiB 单次读处于吞吐甜点区：远离小块读的 syscall 开销，
+        # 又不至于大到冲刷 L2（zipf.write 默认只有 8KiB）
+        with open(file_path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+            shutil.copyfileobj(src, dest, length=128 * 1024)
+        return
+    with open(file_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        with zipf.open(zinfo, 'w') as dest, memoryview(mm) as view:
+            for off in range(0, size, 1024 * 1024):
+                dest.write(view[off:off + 1024 * 1024])
+
+def compress_to_zip(file_path_or_dir, output_zip_path, level=1):
+    """将文件或目录压缩为zip
+
+    上传暂存包的瓶颈在传输而非压缩比，默认用 zlib level 1 换取
+    数倍的压缩吞吐；已压缩格式的文件按 STORED 写入，跳过 DEFLATE。
+    """
+    try:
+        with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True, compresslevel=level) as zipf:
             path_obj = Path(file_path_or_dir)
-            
+
             if path_obj.is_file():
                 # 压缩单个文件
-                zipf.write(file_path_or_dir, path_obj.name)
+                _write_zip_entry(zipf, file_path_or_dir, path_obj.name)
             elif path_obj.is_dir():
                 # 压缩目录
-                for file_path in path_obj.rglob('*'):
-                    if file_path.is_file():
-                        arcname = file_path.relative_to(path_obj.parent)
-                        zipf.write(file_path, arcname)
+                for file_path, arcname in _walk_files(file_path_or_dir):
+                    _write_zip_entry(zipf, file_path, arcname)
             else:
                 raise ValueError(f"路径不存在: {file_path_or_dir}")
         
@@ -248,6 +533,91 @@ def compress_to_zip(file_path_or_dir, output_zip_path):
         log_event("error", f"Failed to compress to zip", {"error": str(e)})
         return False
 
+class _QueueWriter:
+    """把 zipfile 的顺序写入流切成约 8MiB 的分块投入队列。
+
+    只实现分块上传消费者需要的 file-like 协议；不可 seek，
+    zipfile 会自动改用 data descriptor 方式写条目。
+    """
+    CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, chunk_queue):
+        self._queue = chunk_queue
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, data):
+        self._buf += data
+        self._pos += len(data)
+        while len(self._buf) >= self.CHUNK_SIZE:
+            self._queue.put(bytes(self._buf[:self.CHUNK_SIZE]))
+            del self._buf[:self.CHUNK_SIZE]
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._buf:
+            self._queue.put(bytes(self._buf))
+            self._buf = bytearray()
+        self._queue.put(None)
+
+# 内容摘要：blake3 的 SIMD 树哈希单线程可达数 GB/s，
+# 未安装时退回标准库 blake2b（同样远快于 MD5/SHA 系列）
+try:
+    import blake3
+
+    def _new_content_hasher():
+        return blake3.blake3()
+except ImportError:
+    blake3 = None
+
+    def _new_content_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+def _hash_file_content(local_path):
+    """按 1MiB 分块计算文件内容摘要，返回 16 位十六进制短摘要。"""
+    hasher = _new_content_hasher()
+    with open(local_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:16]
+
+def _source_size_within(local_path, is_dir, limit_mb):
+    """判断源数据是否不超过 limit_mb；目录累加中一旦超限立即停止遍历。"""
+    limit = limit_mb * 1024 * 1024
+    try:
+        if not is_dir:
+            return os.path.getsize(local_path) <= limit
+        total = 0
+        for file_path, _ in _walk_files(local_path):
+            total += os.path.getsize(file_path)
+            if total > limit:
+                return False
+        return True
+    except OSError:
+        return False
+
+def _upload_tuning(local_path):
+    """由源文件系统的最优 I/O 块大小推导 SDK 分块上传参数。
+
+    返回 (PartSize_MB, MAXThread)。默认让 SDK 自选时小文件系统块会
+    落入小写入的低吞吐区间，这里显式锁定在 8~64MB。
+    """
+    try:
+        blksize = os.stat(local_path).st_blksize
+    except (OSError, AttributeError):
+        blksize = 4096
+    part_size_mb = max(8, min(64, (blksize * 32) >> 20))
+    return part_size_mb, min(8, os.cpu_count() or 1)
+
 def get_file_size_mb(file_path):
     """获取文件大小（MB）"""
     try:
@@ -261,8 +631,103 @@ class FileOperations:
     def __init__(self, cos_manager):
         self.cos_manager = cos_manager
     
-    def upload_file(self, local_path, cos_folder, remote_filename=None):
-        """上传文件到COS"""
+    def _inmem_compress_upload(self, local_path, cos_key):
+        """压缩结果整段留在内存，一次 put_object 上传。
+
+        小数据专用：跳过分块上传握手（Initiate/Complete 两次额外往返）
+        和所有临时盘 I/O。
+        """
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True, compresslevel=1) as zipf:
+            path_obj = Path(local_path)
+            if path_obj.is_file():
+                _write_zip_entry(zipf, local_path, path_obj.name)
+            else:
+                for file_path, arcname in _walk_files(local_path):
+                    _write_zip_entry(zipf, file_path, arcname)
+        self.cos_manager.client.put_object(
+            Bucket=self.cos_manager.bucket_name, Key=cos_key,
+            Body=buf.getvalue(), ContentType='application/zip')
+
+    def _stream_compress_upload(self, local_path, cos_key):
+        """边压缩边分块上传到 COS，不再经过临时 zip 文件。
+
+        生产者线程把 zip 字节流写入有界队列，当前线程消费队列并逐个
+        upload_part；源文件只读一遍，磁盘带宽减半且无峰值占盘。
+        """
+        client = self.cos_manager.client
+        bucket = self.cos_manager.bucket_name
+
+        response = client.create_multipart_upload(
+            Bucket=bucket, Key=cos_key, ContentType='application/zip')
+        upload_id = response['UploadId']
+
+        chunk_queue = queue.Queue(maxsize=2)
+        producer_error = []
+
+        def _produce():
+            writer = _QueueWriter(chunk_queue)
+            try:
+                with zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED,
+                                     allowZip64=True, compresslevel=1) as zipf:
+                    path_obj = Path(local_path)
+                    if path_obj.is_file():
+                        _write_zip_entry(zipf, local_path, path_obj.name)
+                    else:
+                        for file_path, arcname in _walk_files(local_path):
+                            _write_zip_entry(zipf, file_path, arcname)
+            except Exception as e:
+                producer_error.append(e)
+            finally:
+                writer.close()
+
+        producer = threading.Thread(target=_produce, daemon=True)
+        producer.start()
+
+        parts = []
+        part_number = 1
+        try:
+            while True:
+                chunk = chunk_queue.get()
+                if chunk is None:
+                    break
+                part_response = client.upload_part(
+                    Bucket=bucket, Key=cos_key, UploadId=upload_id,
+                    PartNumber=part_number, Body=chunk)
+                parts.append({'PartNumber': part_number, 'ETag': part_response['ETag']})
+                part_number += 1
+
+            producer.join()
+            if producer_error:
+                raise producer_error[0]
+
+            client.complete_multipart_upload(
+                Bucket=bucket, Key=cos_key, UploadId=upload_id,
+                MultipartUpload={'Part': parts})
+        except Exception:
+            # 生产者可能正阻塞在有界队列的 put 上：先把队列抽干让它
+            # 跑完退出，否则线程连同源文件句柄/mmap 一起泄漏（常驻
+            # 模式下每次瞬时失败都会累积一个，且回退直传还会与之争读）
+            while producer.is_alive():
+                try:
+                    chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+            client.abort_multipart_upload(Bucket=bucket, Key=cos_key, UploadId=upload_id)
+            raise
+
+    def upload_file(self, local_path, cos_folder, remote_filename=None, content_hash=False):
+        """上传文件到COS
+
+        content_hash=True 时按内容寻址：键里嵌入内容摘要，上传前先
+        HEAD 探测，同一内容换了文件名也只传一次。
+        """
+        # 工具调用路径下布尔参数以字符串到达（"true"/"false"），直接
+        # 真值判断会把 "false" 当成 True：先归一化成真正的布尔值
+        if isinstance(content_hash, str):
+            content_hash = content_hash.strip().lower() in ("true", "1", "yes")
         try:
             # 检查权限
             allowed, message = self.cos_manager.permission_manager.check_permission(cos_folder, 'upload')
@@ -282,49 +747,95 @@ class FileOperations:
             
             # 检查文件大小，决定是否压缩
             file_size_mb = get_file_size_mb(local_path)
-            should_compress = file_size_mb > self.cos_manager.compress_threshold_mb or os.path.isdir(local_path)
+            is_dir = os.path.isdir(local_path)
+            should_compress = file_size_mb > self.cos_manager.compress_threshold_mb or is_dir
+
+            # 内容寻址去重：键只由内容摘要决定（文件名仅作为元数据
+            # 返回），改名后的相同内容仍命中同一个键；HEAD 命中即跳过
+            # 整个传输。同样因为键必须只取决于内容，该路径不做压缩
+            # （目录不适用）
+            if content_hash and not is_dir:
+                digest = _hash_file_content(local_path)
+                cos_key = f"{self.cos_manager.agent_parent_dir}/{cos_folder}/{digest}"
+                if self.cos_manager._head_exists(cos_key):
+                    log_event("info", "Content already uploaded, skipping transfer", {
+                        "local_path": local_path,
+                        "cos_key": cos_key
+                    })
+                    return {
+                        "success": True,
+                        "cos_key": cos_key,
+                        "remote_filename": remote_filename,
+                        "size_mb": file_size_mb,
+                        "deduplicated": True,
+                        "message": f"相同内容已存在，跳过上传: {cos_key}"
+                    }
+                should_compress = False
+
+            # 已压缩格式（.zip/.jpg/.mp4 等或压缩魔数）再 DEFLATE 近乎无收益，
+            # 直接原样上传，省掉整份读取 + 压缩 + 临时盘写
+            if should_compress and not is_dir and _is_incompressible(local_path):
+                should_compress = False
             
             if should_compress:
-                # 创建临时zip文件
-                with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-                    temp_zip_path = temp_zip.name
-                
-                if compress_to_zip(local_path, temp_zip_path):
-                    # 上传压缩文件
-                    cos_key = f"{self.cos_manager.agent_parent_dir}/{cos_folder}/{remote_filename}.zip"
-                    response = self.cos_manager.client.upload_file(
-                        Bucket=self.cos_manager.bucket_name,
-                        Key=cos_key,
-                        LocalFilePath=temp_zip_path,
-                        EnableMD5=True
-                    )
-                    # 清理临时文件
-                    os.unlink(temp_zip_path)
-                    
+                try:
+                    # 边压缩边分块上传，不落临时 zip；源数据足够小时
+                    # 压缩结果直接留在内存单次 put_object
+                    zip_cos_key = f"{self.cos_manager.agent_parent_dir}/{cos_folder}/{remote_filename}.zip"
+                    if _source_size_within(local_path, is_dir, _INMEM_UPLOAD_MB):
+                        self._inmem_compress_upload(local_path, zip_cos_key)
+                    else:
+                        self._stream_compress_upload(local_path, zip_cos_key)
+
                     log_event("info", f"File uploaded and compressed", {
                         "local_path": local_path,
-                        "cos_key": cos_key,
+                        "cos_key": zip_cos_key,
                         "original_size_mb": file_size_mb
                     })
-                    
+
                     return {
                         "success": True,
-                        "cos_key": cos_key,
+                        "cos_key": zip_cos_key,
                         "original_size_mb": file_size_mb,
                         "compressed": True,
-                        "message": f"文件已压缩并上传到: {cos_key}"
+                        "message": f"文件已压缩并上传到: {zip_cos_key}"
                     }
-                else:
-                    # 压缩失败，尝试直接上传
-                    os.unlink(temp_zip_path)
+                except Exception as e:
+                    if is_dir:
+                        raise
+                    # 压缩上传失败，尝试直接上传
+                    log_event("warning", "Streaming compressed upload failed, falling back to direct upload", {
+                        "local_path": local_path,
+                        "error": str(e)
+                    })
             
             # 直接上传文件
-            response = self.cos_manager.client.upload_file(
-                Bucket=self.cos_manager.bucket_name,
-                Key=cos_key,
-                LocalFilePath=local_path,
-                EnableMD5=True
-            )
+            size_bytes = 0 if is_dir else os.path.getsize(local_path)
+            if _MMAP_WRITE_THRESHOLD <= size_bytes <= _MMAP_PUT_LIMIT:
+                # 中等大小文件 mmap 后作为缓冲对象一次 put_object：
+                # TLS 栈直接从映射页读取，省掉 SDK 分块路径里
+                # 每块一次的用户态拷贝和 bytes 分配
+                with open(local_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    response = self.cos_manager.client.put_object(
+                        Bucket=self.cos_manager.bucket_name,
+                        Key=cos_key,
+                        Body=mm
+                    )
+            else:
+                # 小文件或超出单 PUT 适用范围的，仍走 SDK 分块上传；
+                # 分块大小与并发按文件系统最优块显式指定
+                part_size_mb, max_thread = _upload_tuning(local_path)
+                response = self.cos_manager.client.upload_file(
+                    Bucket=self.cos_manager.bucket_name,
+                    Key=cos_key,
+                    LocalFilePath=local_path,
+                    PartSize=part_size_mb,
+                    MAXThread=max_thread,
+                    EnableMD5=True
+                )
             
             log_event("info", f"File uploaded successfully", {
                 "local_path": local_path,
@@ -335,6 +846,7 @@ class FileOperations:
             return {
                 "success": True,
                 "cos_key": cos_key,
+                "remote_filename": remote_filename,
                 "size_mb": file_size_mb,
                 "compressed": False,
                 "message": f"文件已上传到: {cos_key}"
@@ -349,28 +861,60 @@ class FileOperations:
         except Exception as e:
             log_event("error", "Unexpected error during upload", {"error": str(e)})
             return {"success": False, "error": f"上传失败: {e}"}
-    
+
+    def batch_upload(self, files):
+        """并行批量上传多个文件
+
+        files 为 {"local_path", "cos_folder", "remote_filename"} 的列表。
+        一次调用即可上传 N 个文件：解释器启动、TLS 握手和签名成本只
+        付一次，客户端线程安全，工作线程间共享同一个连接池并重叠
+        网络 I/O。
+        """
+        try:
+            results = [None] * len(files)
+            with ThreadPoolExecutor(max_workers=min(16, len(files))) as executor:
+                futures = {
+                    executor.submit(self.upload_file,
+                                    item.get("local_path"),
+                                    item.get("cos_folder"),
+                                    item.get("remote_filename")): i
+                    for i, item in enumerate(files)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+
+            succeeded = sum(1 for r in results if r.get("success"))
+            log_event("info", "Batch upload finished", {
+                "requested": len(files),
+                "succeeded": succeeded
+            })
+            return {
+                "success": succeeded == len(files),
+                "results": results,
+                "message": f"批量上传完成: {succeeded}/{len(files)} 成功"
+            }
+        except Exception as e:
+            log_event("error", "Unexpected error during batch upload", {"error": str(e)})
+            return {"success": False, "error": f"批量上传失败: {e}"}
+
     def download_file(self, cos_key, local_path=None):
         """从COS下载文件"""
         try:
             # 解析COS键获取文件夹信息
-            key_parts = cos_key.split('/')
-            if len(key_parts) < 3 or key_parts[0] != self.cos_manager.agent_parent_dir:
+            cos_folder, filename = self.cos_manager.parse_key(cos_key)
+            if cos_folder is None:
                 return {"success": False, "error": f"无效的COS键格式: {cos_key}"}
-            
-            cos_folder = key_parts[1]
-            
+
             # 检查权限
             allowed, message = self.cos_manager.permission_manager.check_permission(cos_folder, 'download')
             if not allowed:
                 return {"success": False, "error": message}
-            
+
             # 确定本地保存路径
             if not local_path:
                 # 使用下载目录
                 download_dir = os.path.join(os.path.dirname(__file__), 'download')
                 os.makedirs(download_dir, exist_ok=True)
-                filename = key_parts[-1]
                 local_path = os.path.join(download_dir, filename)
             
             # 确保本地目录存在
@@ -413,12 +957,10 @@ class FileOperations:
         """在COS中复制文件"""
         try:
             # 解析源COS键获取文件夹信息
-            source_parts = source_cos_key.split('/')
-            if len(source_parts) < 3 or source_parts[0] != self.cos_manager.agent_parent_dir:
+            source_folder, source_filename = self.cos_manager.parse_key(source_cos_key)
+            if source_folder is None:
                 return {"success": False, "error": f"无效的源COS键格式: {source_cos_key}"}
             
-            source_folder = source_parts[1]
-            
             # 检查源文件夹的复制移动权限
             allowed, message = self.cos_manager.permission_manager.check_permission(source_folder, 'copy_move')
             if not allowed:
@@ -431,7 +973,7 @@ class FileOperations:
             
             # 确定目标文件名
             if not target_filename:
-                target_filename = source_parts[-1]
+                target_filename = source_filename
             
             # 构建目标COS键
             target_cos_key = f"{self.cos_manager.agent_parent_dir}/{target_cos_folder}/{target_filename}"
@@ -506,12 +1048,10 @@ class FileOperations:
         """删除COS中的文件"""
         try:
             # 解析COS键获取文件夹信息
-            key_parts = cos_key.split('/')
-            if len(key_parts) < 3 or key_parts[0] != self.cos_manager.agent_parent_dir:
+            cos_folder, _ = self.cos_manager.parse_key(cos_key)
+            if cos_folder is None:
                 return {"success": False, "error": f"无效的COS键格式: {cos_key}"}
-            
-            cos_folder = key_parts[1]
-            
+
             # 检查权限（除非跳过）
             if not skip_permission_check:
                 allowed, message = self.cos_manager.permission_manager.check_permission(cos_folder, 'delete')
@@ -548,19 +1088,113 @@ class FileOperations:
             log_event("error", "Unexpected error during delete", {"error": str(e)})
             return {"success": False, "error": f"删除失败: {e}"}
     
+    def delete_files(self, cos_keys, skip_permission_check=False):
+        """批量删除COS中的文件
+
+        delete_objects 一次请求最多接受 1000 个键，把 N 次删除往返
+        合并成 ceil(N/1000) 次。
+        """
+        try:
+            if not cos_keys:
+                return {"success": True, "deleted": [], "message": "没有需要删除的文件"}
+
+            # 每个文件夹只做一次权限检查
+            checked_folders = set()
+            for cos_key in cos_keys:
+                cos_folder, _ = self.cos_manager.parse_key(cos_key)
+                if cos_folder is None:
+                    return {"success": False, "error": f"无效的COS键格式: {cos_key}"}
+                if cos_key.endswith('/'):
+                    return {"success": False, "error": "不能删除目录，只能删除文件"}
+                if not skip_permission_check and cos_folder not in checked_folders:
+                    allowed, message = self.cos_manager.permission_manager.check_permission(cos_folder, 'delete')
+                    if not allowed:
+                        return {"success": False, "error": message}
+                    checked_folders.add(cos_folder)
+
+            deleted = []
+            errors = []
+            for i in range(0, len(cos_keys), 1000):
+                batch = cos_keys[i:i + 1000]
+                response = self.cos_manager.client.delete_objects(
+                    Bucket=self.cos_manager.bucket_name,
+                    Delete={'Object': [{'Key': k} for k in batch]}
+                )
+                deleted.extend(d.get('Key') for d in response.get('Deleted', []))
+                errors.extend(response.get('Error', []))
+
+            log_event("info", f"Files deleted in batch", {
+                "requested": len(cos_keys),
+                "deleted": len(deleted),
+                "errors": len(errors)
+            })
+
+            return {
+                "success": not errors,
+                "deleted": deleted,
+                "errors": errors,
+                "message": f"已删除 {len(deleted)}/{len(cos_keys)} 个文件"
+            }
+
+        except CosClientError as e:
+            log_event("error", "COS client error during batch delete", {"error": str(e)})
+            return {"success": False, "error": f"COS客户端错误: {e}"}
+        except CosServiceError as e:
+            log_event("error", "COS service error during batch delete", {"error": str(e)})
+            return {"success": False, "error": f"COS服务错误: {e}"}
+        except Exception as e:
+            log_event("error", "Unexpected error during batch delete", {"error": str(e)})
+            return {"success": False, "error": f"批量删除失败: {e}"}
+
+    def move_files(self, source_cos_keys, target_cos_folder):
+        """批量移动文件：COPY 没有批量接口只能逐个，删除合并为一次批量请求"""
+        try:
+            copy_results = []
+            copied_keys = []
+            for source_cos_key in source_cos_keys:
+                copy_result = self.copy_file(source_cos_key, target_cos_folder)
+                copy_results.append(copy_result)
+                if copy_result["success"]:
+                    copied_keys.append(source_cos_key)
+
+            delete_result = self.delete_files(copied_keys, skip_permission_check=True)
+            if not delete_result.get("success"):
+                log_event("warning", "Source deletion failed after batch copy", {
+                    "errors": delete_result.get("errors") or delete_result.get("error")
+                })
+
+            moved = len(copied_keys)
+            return {
+                "success": moved == len(source_cos_keys),
+                "results": copy_results,
+                "message": f"已移动 {moved}/{len(source_cos_keys)} 个文件"
+            }
+
+        except Exception as e:
+            log_event("error", "Unexpected error during batch move", {"error": str(e)})
+            return {"success": False, "error": f"批量移动失败: {e}"}
+
     def list_files(self, cos_folder=None):
         """列出COS中的文件"""
         try:
             # 如果没有指定文件夹，列出所有文件夹
             if cos_folder is None:
                 result = {}
-                for folder_name in self.cos_manager.permission_manager.permissions.keys():
-                    folder_result = self._list_folder_files(folder_name)
-                    if folder_result["success"]:
-                        result[folder_name] = folder_result["files"]
-                    else:
-                        result[folder_name] = f"错误: {folder_result['error']}"
-                
+                folders = list(self.cos_manager.permission_manager.permissions.keys())
+                if folders:
+                    # 每个文件夹的列举是独立的 HTTPS 调用，并发执行后
+                    # 墙钟时间从 K×RTT 降到 ~1×RTT（连接池足够大）
+                    with ThreadPoolExecutor(max_workers=min(16, len(folders))) as executor:
+                        futures = {executor.submit(self._list_folder_files, name): name
+                                   for name in folders}
+                        for future in as_completed(futures):
+                            folder_name = futures[future]
+                            folder_result = future.result()
+                            if folder_result["success"]:
+                                result[folder_name] = folder_result["files"]
+                            else:
+                                result[folder_name] = f"错误: {folder_result['error']}"
+
                 return {
                     "success": True,
                     "folders": result,
@@ -610,7 +1244,9 @@ class FileOperations:
                                 "etag": content.get('ETag', '')
                             })
                 
-                if response.get('IsTruncated') == 'false':
+                # SDK 对 IsTruncated 时而返回字符串时而返回布尔值，
+                # 统一归一化，避免分页判断失败导致死循环
+                if str(response.get('IsTruncated', 'false')).lower() == 'false':
                     break
                 
                 marker = response.get("NextMarker", "")
@@ -660,8 +1296,7 @@ class VirusDetection:
             
             if key:
                 # 验证key格式
-                key_parts = key.split('/')
-                if len(key_parts) < 3 or key_parts[0] != self.cos_manager.agent_parent_dir:
+                if self.cos_manager.parse_key(key)[0] is None:
                     return {"success": False, "error": f"无效的COS键格式: {key}"}
                 
                 # 病毒检测无需权限检查
@@ -740,10 +1375,22 @@ class VirusDetection:
             return {"success": False, "error": f"查询病毒检测结果失败: {e}"}
 
 # --- 主逻辑 ---
+def _reply(result):
+    """按 result 的 success 字段输出成功/失败响应，返回是否成功。
+
+    退出码由调用方决定：单次模式据此 sys.exit(1)，常驻模式继续循环。
+    """
+    if result.get("success", True):
+        print_json_output("success", result=result)
+        return True
+    print_json_output("error", error=result.get("error") or result.get("message"))
+    return False
+
 def main():
     # 加载环境变量
     dotenv_path = os.path.join(os.path.dirname(__file__), 'config.env')
     load_dotenv(dotenv_path=dotenv_path)
+    _load_env_flags()
     
     try:
         # 初始化COS客户端管理器
@@ -760,164 +1407,105 @@ def main():
         # 初始化病毒检测
         virus_detection = VirusDetection(cos_manager)
         
-        # 读取输入
-        try:
-            input_str = sys.stdin.read()
-            log_event("debug", "Received input from stdin", {"input_length": len(input_str)})
-            input_data = json.loads(input_str)
-        except json.JSONDecodeError:
-            log_event("error", "Failed to decode JSON input")
-            print_json_output("error", error="无效的JSON输入")
-            sys.exit(1)
-        
-        command = input_data.get("command")
-        
-        if command == "get_permissions":
+        def _get_permissions():
             # 返回权限描述
-            description = cos_manager.permission_manager.get_all_permissions_description()
-            result = {
+            return {
                 "bucket_name": cos_manager.bucket_name,
                 "region": cos_manager.region,
                 "parent_directory": cos_manager.agent_parent_dir,
-                "permissions": description,
+                "permissions": cos_manager.permission_manager.get_all_permissions_description(),
                 "compress_threshold_mb": cos_manager.compress_threshold_mb
             }
-            print_json_output("success", result=result)
-        
-        elif command == "upload_file":
-            local_path = input_data.get("local_path")
-            cos_folder = input_data.get("cos_folder")
-            remote_filename = input_data.get("remote_filename")
-            
-            if not local_path or not cos_folder:
-                print_json_output("error", error="缺少必需参数: local_path, cos_folder")
-                sys.exit(1)
-            
-            result = file_ops.upload_file(local_path, cos_folder, remote_filename)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "download_file":
-            cos_key = input_data.get("cos_key")
-            local_path = input_data.get("local_path")
-            
-            if not cos_key:
-                print_json_output("error", error="缺少必需参数: cos_key")
-                sys.exit(1)
-            
-            result = file_ops.download_file(cos_key, local_path)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "copy_file":
-            source_cos_key = input_data.get("source_cos_key")
-            target_cos_folder = input_data.get("target_cos_folder")
-            target_filename = input_data.get("target_filename")
-            
-            if not source_cos_key or not target_cos_folder:
-                print_json_output("error", error="缺少必需参数: source_cos_key, target_cos_folder")
-                sys.exit(1)
-            
-            result = file_ops.copy_file(source_cos_key, target_cos_folder, target_filename)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "move_file":
-            source_cos_key = input_data.get("source_cos_key")
-            target_cos_folder = input_data.get("target_cos_folder")
-            target_filename = input_data.get("target_filename")
-            
-            if not source_cos_key or not target_cos_folder:
-                print_json_output("error", error="缺少必需参数: source_cos_key, target_cos_folder")
-                sys.exit(1)
-            
-            result = file_ops.move_file(source_cos_key, target_cos_folder, target_filename)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "delete_file":
-            cos_key = input_data.get("cos_key")
-            
-            if not cos_key:
-                print_json_output("error", error="缺少必需参数: cos_key")
-                sys.exit(1)
-            
-            result = file_ops.delete_file(cos_key)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "list_files":
-            cos_folder = input_data.get("cos_folder")
-            
-            result = file_ops.list_files(cos_folder)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "submit_virus_detection_by_key":
-            key = input_data.get("key")
-            
-            if not key:
-                print_json_output("error", error="缺少必需参数: key")
-                sys.exit(1)
-            
-            result = virus_detection.submit_virus_detection(key=key, url=None)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "submit_virus_detection_by_url":
-            url = input_data.get("url")
-            
-            if not url:
-                print_json_output("error", error="缺少必需参数: url")
-                sys.exit(1)
-            
-            result = virus_detection.submit_virus_detection(key=None, url=url)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        elif command == "query_virus_detection":
-            job_id = input_data.get("job_id")
-            
-            if not job_id:
-                print_json_output("error", error="缺少必需参数: job_id")
-                sys.exit(1)
-            
-            result = virus_detection.query_virus_detection(job_id)
-            if result["success"]:
-                print_json_output("success", result=result)
-            else:
-                print_json_output("error", error=result["error"])
-                sys.exit(1)
-        
-        else:
-            # 其他命令的占位符实现
-            print_json_output("error", error=f"命令 '{command}' 暂未实现")
+
+        # 命令分发表：command → (处理函数, 必需参数, 可选参数)。
+        # O(1) 哈希分发取代十余条 elif 的逐串比较，参数校验收敛到一处
+        handlers = {
+            "get_permissions": (_get_permissions, (), ()),
+            "upload_file": (file_ops.upload_file, ("local_path", "cos_folder"),
+                            ("remote_filename", "content_hash")),
+            "batch_upload": (file_ops.batch_upload, ("files",), ()),
+            "download_file": (file_ops.download_file, ("cos_key",), ("local_path",)),
+            "copy_file": (file_ops.copy_file, ("source_cos_key", "target_cos_folder"), ("target_filename",)),
+            "move_file": (file_ops.move_file, ("source_cos_key", "target_cos_folder"), ("target_filename",)),
+            "delete_file": (file_ops.delete_file, ("cos_key",), ()),
+            "delete_files": (file_ops.delete_files, ("cos_keys",), ()),
+            "move_files": (file_ops.move_files, ("source_cos_keys", "target_cos_folder"), ()),
+            "list_files": (file_ops.list_files, (), ("cos_folder",)),
+            "submit_virus_detection_by_key":
+                (lambda key: virus_detection.submit_virus_detection(key=key, url=None), ("key",), ()),
+            "submit_virus_detection_by_url":
+                (lambda url: virus_detection.submit_virus_detection(key=None, url=url), ("url",), ()),
+            "query_virus_detection": (virus_detection.query_virus_detection, ("job_id",), ()),
+        }
+        # 必须为非空列表的参数及其在错误消息中的展示名
+        list_params = {"cos_keys": "cos_keys (列表)", "source_cos_keys": "source_cos_keys (列表)",
+                       "files": "files (列表)"}
+
+        def _execute(input_data):
+            """分发并执行单条命令，输出响应，返回是否成功。"""
+            command = input_data.get("command")
+            entry = handlers.get(command)
+            if entry is None:
+                # 其他命令的占位符实现
+                print_json_output("error", error=f"命令 '{command}' 暂未实现")
+                return False
+
+            fn, required, optional = entry
+            # VCP 的工具调用路径把「始」…「末」里的参数值一律按字符串
+            # 透传，列表参数到达这里是 JSON 编码的字符串：先解码再校验
+            for p in list_params:
+                v = input_data.get(p)
+                if isinstance(v, str):
+                    try:
+                        input_data[p] = _loads(v)
+                    except ValueError:
+                        pass
+            if any(not input_data.get(p)
+                   or (p in list_params and not isinstance(input_data[p], list))
+                   for p in required):
+                names = ", ".join(list_params.get(p, p) for p in required)
+                print_json_output("error", error=f"缺少必需参数: {names}")
+                return False
+
+            return _reply(fn(**{p: input_data.get(p) for p in required + optional}))
+
+        if "--daemon" in sys.argv[1:]:
+            # 常驻模式：按行读取 JSON 命令、逐行应答。SDK 导入、客户端
+            # 构造、TLS 会话与签名上下文在多条命令间摊销，调用方用一个
+            # 子进程管道发 N 条命令，而不是起 N 个解释器
+            for line in sys.stdin.buffer:
+                if line.isspace():
+                    continue
+                # 解析器本身容忍首尾空白，不再 strip 复制一份
+                try:
+                    input_data = _loads(line)
+                except ValueError:
+                    print_json_output("error", error="无效的JSON输入")
+                    continue
+                try:
+                    _execute(input_data)
+                except Exception as e:
+                    # 单条命令的意外错误不终止常驻循环
+                    log_event("error", "Unexpected error in daemon command",
+                              {"error": str(e), "traceback": traceback.format_exc()})
+                    print_json_output("error", error=f"发生意外错误: {e}")
+            return
+
+        # 单次模式：读取整个 stdin 作为一条命令。字节直接进解析器
+        # （orjson 原生吃 bytes），不保留中间绑定——大载荷（如
+        # batch_upload）解析完后原始字节立即可回收，峰值内存减半
+        try:
+            input_data = _loads(sys.stdin.buffer.read())
+        except ValueError:
+            # orjson 与 stdlib 的 JSONDecodeError 都是 ValueError 子类
+            log_event("error", "Failed to decode JSON input")
+            print_json_output("error", error="无效的JSON输入")
             sys.exit(1)
-    
+        log_event("debug", "Received input from stdin")
+
+        if not _execute(input_data):
+            sys.exit(1)
+
     except Exception as e:
         log_event("error", "Unexpected error in main", {"error": str(e), "traceback": traceback.format_exc()})
         print_json_output("error", error=f"发生意外错误: {e}")
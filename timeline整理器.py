@@ -1,7 +1,21 @@
 import os
 import json
+import re
 from collections import OrderedDict
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# ISO 日期键的校验正则：模块级编译一次，免去每个键的隐式缓存查找
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+try:
+    # 超大时间线文件可用 ijson 流式解析（C 后端逐事件产出），
+    # 未安装时一律走 json.load
+    import ijson
+except ImportError:
+    ijson = None
+
+# 输入超过该大小时启用流式解析
+_STREAM_THRESHOLD = 32 * 1024 * 1024
 
 def process_timeline_file(input_path, output_path):
     """
@@ -9,37 +23,65 @@ def process_timeline_file(input_path, output_path):
     并将结果以 Markdown 格式写入一个新的 .txt 文件。
     """
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if ijson is not None and os.path.getsize(input_path) >= _STREAM_THRESHOLD:
+            # 流式解析：两遍常数内存扫描，只有 entries 本身被物化，
+            # 不再额外保留整个文档的解码副本
+            character_name = '未知角色'
+            last_updated = '未知'
+            with open(input_path, 'rb') as f:
+                for prefix, _, value in ijson.parse(f):
+                    if prefix == 'character':
+                        character_name = value
+                    elif prefix == 'lastUpdated':
+                        last_updated = value
+            with open(input_path, 'rb') as f:
+                entries = dict(ijson.kvitems(f, 'entries'))
+        else:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data.get('entries')
+            character_name = data.get('character', '未知角色')
+            last_updated = data.get('lastUpdated', '未知')
 
-        entries = data.get('entries')
         if not entries:
             print(f"在 {input_path} 中未找到任何条目，已跳过。")
             return
 
-        # 按升序（最早优先）对日期进行排序
-        # Python 3.7+ dicts preserve insertion order, but sorting keys is more robust.
-        sorted_dates = sorted(entries.keys(), key=lambda date_str: datetime.strptime(date_str, '%Y-%m-%d'))
+        # 先用预编译正则过滤非日期键：以前一个坏键会让 strptime 抛异常、
+        # 整个文件处理中断，现在只跳过坏键并提示
+        valid_dates = [d for d in entries.keys() if _DATE_RE.fullmatch(d)]
+        skipped = len(entries) - len(valid_dates)
+        if skipped:
+            print(f"警告: {input_path} 中有 {skipped} 个非日期键已被忽略。")
+
+        # 按升序（最早优先）对日期进行排序。键已由正则确认是
+        # YYYY-MM-DD，该格式字典序即时间序，纯字符串比较即可，
+        # 不必为每个键走一遍 strptime 和 datetime 构造
+        sorted_dates = sorted(valid_dates)
+
+        # 先在内存拼好全部内容，一次性写出：成千上万次过文本编码器的
+        # 小 write 变成一次 encode + 一次系统调用
+        parts = [
+            # 文件头信息
+            f"# {character_name}的时间线\n",
+            f"> 最后更新: {last_updated}\n",
+            "---\n\n",
+        ]
+        for i, date in enumerate(sorted_dates):
+            # 每个日期只做一次 dict 查找，条目批量 extend（C 层迭代）
+            rows = entries[date]
+            parts.append(f"## {date}\n")
+            parts.extend(
+                f"- {entry.get('summary', '无有效总结').strip().rstrip('。<')}\n"
+                for entry in rows)
+
+            # 在日期块之间添加一个空行以提高可读性，但最后一个块后面不加
+            if i < len(sorted_dates) - 1:
+                parts.append("\n")
 
         # 将处理后的内容写入输出文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            character_name = data.get('character', '未知角色')
-            last_updated = data.get('lastUpdated', '未知')
-            
-            # 写入文件头信息
-            f.write(f"# {character_name}的时间线\n")
-            f.write(f"> 最后更新: {last_updated}\n")
-            f.write("---\n\n")
-
-            for i, date in enumerate(sorted_dates):
-                f.write(f"## {date}\n")
-                for entry in entries[date]:
-                    summary = entry.get('summary', '无有效总结').strip().rstrip('。<')
-                    f.write(f"- {summary}\n")
-                
-                # 在日期块之间添加一个空行以提高可读性，但最后一个块后面不加
-                if i < len(sorted_dates) - 1:
-                    f.write("\n")
+        with open(output_path, 'wb') as f:
+            f.write(''.join(parts).encode('utf-8'))
         
         print(f"成功处理 '{input_path}' -> '{output_path}'")
 
@@ -51,6 +93,11 @@ def process_timeline_file(input_path, output_path):
         print(f"处理 {input_path} 时发生错误: {e}")
 
 
+def _process_pair(pair):
+    """进程池工作函数：展开 (输入路径, 输出路径) 并处理。"""
+    process_timeline_file(*pair)
+
+
 def main():
     """
     主函数，用于查找和处理所有时间线JSON文件。
@@ -68,15 +115,22 @@ def main():
         os.makedirs(output_dir)
         print(f"已创建输出目录: '{output_dir}'")
 
-    processed_count = 0
-    for filename in os.listdir(input_dir):
-        if filename.endswith("_timeline.json"):
-            input_file_path = os.path.join(input_dir, filename)
-            # 将输出文件的扩展名更改为 .txt
-            output_filename = filename.replace('_timeline.json', '_timeline.txt')
-            output_file_path = os.path.join(output_dir, output_filename)
-            process_timeline_file(input_file_path, output_file_path)
-            processed_count += 1
+    # scandir 的条目自带类型和完整路径，免去 listdir 后逐个 join + stat
+    pairs = []
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            filename = entry.name
+            if filename.endswith("_timeline.json") and entry.is_file():
+                # 将输出文件的扩展名更改为 .txt
+                output_filename = filename.replace('_timeline.json', '_timeline.txt')
+                pairs.append((entry.path, os.path.join(output_dir, output_filename)))
+
+    processed_count = len(pairs)
+    if pairs:
+        # 各文件互不相关，解析与排序都是 CPU 密集：进程池并行处理
+        with ProcessPoolExecutor() as executor:
+            for _ in executor.map(_process_pair, pairs):
+                pass
     
     if processed_count == 0:
         print(f"在 '{input_dir}' 目录中没有找到需要处理的 'XXX_timeline.json' 文件。")